@@ -1,10 +1,6 @@
 # app/main.py
 import streamlit as st
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 import os
-from utils import load_country_data, summary_statistics, get_country_metrics
 
 # -----------------------
 # Page & style settings
@@ -14,7 +10,6 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
-sns.set_style("whitegrid")
 
 DATA_DIR = os.path.join(os.getcwd(), "data")
 
@@ -29,21 +24,32 @@ page = st.sidebar.radio(
 # -----------------------
 # Helper function
 # -----------------------
-def get_country_df(country, key_prefix=""):
-    """Load from local data folder or uploaded CSV"""
+# pandas/matplotlib/seaborn (and utils, which pulls in pandas) are imported
+# inside the pages that need them, so the first render is not held up by them
+def _lazy_plot():
+    """Import matplotlib and seaborn on first use and apply the dashboard style"""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    sns.set_style("whitegrid")
+    return plt, sns
+
+def get_country_df(country, key_prefix="", columns=None):
+    """Load from local data folder or uploaded CSV (optionally only `columns`)"""
+    from utils import load_country_data
     uploaded_file = st.file_uploader(f"Upload {country} CSV", type="csv", key=f"{key_prefix}_{country}")
     
     if uploaded_file:
-        df = pd.read_csv(uploaded_file)
         st.info(f"{country} CSV loaded from upload ✅")
-        return df
-    else:
-        file_path = os.path.join(DATA_DIR, f"{country.lower().replace(' ','')}_clean.csv")
-        if os.path.exists(file_path):
-            df = pd.read_csv(file_path)
-            return df
-        else:
-            return pd.DataFrame()  # empty dataframe
+    return load_country_data(country, DATA_DIR, uploaded_file=uploaded_file, columns=columns)
+
+def get_uploaded_files(countries, key_prefix=""):
+    """One CSV uploader per country; returns {country: uploaded_file or None}"""
+    uploaded_files = {}
+    for c in countries:
+        uploaded_files[c] = st.file_uploader(f"Upload {c} CSV", type="csv", key=f"{key_prefix}_{c}")
+        if uploaded_files[c]:
+            st.info(f"{c} CSV loaded from upload ✅")
+    return uploaded_files
 
 # -----------------------
 # Overview Page
@@ -64,24 +70,17 @@ if page == "Overview":
     """)
 
     # Upload CSVs for each country
-    df_benin = get_country_df("Benin", key_prefix="overview")
-    df_sierra = get_country_df("Sierra Leone", key_prefix="overview")
-    df_togo = get_country_df("Togo", key_prefix="overview")
+    uploaded_files = get_uploaded_files(["Benin", "Sierra Leone", "Togo"], key_prefix="overview")
 
-    dfs = [df for df in [df_benin, df_sierra, df_togo] if not df.empty]
-
-    if dfs:
-        # Calculate summary from uploaded data or local CSVs
-        df_summary = pd.DataFrame()
-        for df, country in zip(dfs, ["Benin","Sierra Leone","Togo"]):
-            if not df.empty:
-                avg = df[["GHI","DNI","DHI"]].mean()
-                avg["country"] = country
-                df_summary = pd.concat([df_summary, pd.DataFrame([avg])], ignore_index=True)
+    # Calculate summary from uploaded data or local CSVs (cached when local)
+    from utils import get_country_metrics
+    df_summary = get_country_metrics(DATA_DIR, uploaded_files=uploaded_files)
 
+    if not df_summary.empty:
         st.subheader("Average Solar Irradiance per Country")
         st.dataframe(df_summary.set_index("country"))
 
+        plt, sns = _lazy_plot()
         fig, ax = plt.subplots(figsize=(7,5))
         sns.barplot(data=df_summary, x="country", y="GHI", palette="viridis")
         ax.set_title("Average GHI by Country", fontsize=13)
@@ -103,26 +102,28 @@ elif page == "Country Comparison":
     )
     metric = st.selectbox("Select metric:", ["GHI", "DNI", "DHI"])
 
-    dfs = []
-    for c in countries:
-        df = get_country_df(c, key_prefix="comparison")
-        if not df.empty:
-            df["country"] = c
-            dfs.append(df)
+    uploaded_files = get_uploaded_files(countries, key_prefix="comparison")
+    from utils import load_all
+    # concatenated frame is cached per (countries, columns) when no uploads are used
+    df_all = load_all(countries, DATA_DIR, columns=[metric], uploaded_files=uploaded_files)
 
-    if len(dfs) == 0:
+    if df_all.empty:
         st.warning("No data available. Upload CSVs above.")
         st.stop()
 
-    df_all = pd.concat(dfs, ignore_index=True)
-
+    plt, sns = _lazy_plot()
     fig, ax = plt.subplots(figsize=(10,6))
     sns.boxplot(data=df_all, x="country", y=metric, palette="viridis")
     ax.set_title(f"{metric} Distribution by Country")
     st.pyplot(fig)
 
     st.subheader("📊 Summary Table")
-    summary = df_all.groupby("country")[metric].agg(["mean", "median", "std"]).round(2)
+    # float64 so .round(2) yields clean values from the float32 column
+    summary = (
+        df_all[metric].astype("float64")
+        .groupby(df_all["country"], observed=True)
+        .agg(["mean", "median", "std"]).round(2)
+    )
     st.dataframe(summary)
 
     csv = summary.to_csv().encode("utf-8")
@@ -134,12 +135,20 @@ elif page == "Country Comparison":
 elif page == "Explore Country":
     st.title("📈 Explore Country Data")
     country = st.selectbox("Choose a country:", ["Benin", "Sierra Leone", "Togo"])
-    df = get_country_df(country, key_prefix="explore")
+    # every metric, summary and heatmap column shown on this page
+    explore_cols = ["GHI", "DNI", "DHI", "Tamb", "RH", "WS"]
+    df = get_country_df(country, key_prefix="explore", columns=["Timestamp"] + explore_cols)
 
     if df.empty:
         st.stop()
 
-    df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
+    import pandas as pd
+    from utils import summary_statistics, correlation_matrix
+    plt, sns = _lazy_plot()
+
+    # Parquet keeps datetime64; only CSV sources need parsing
+    if not pd.api.types.is_datetime64_any_dtype(df["Timestamp"]):
+        df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
     metric = st.selectbox("Select Metric to visualize:", ["GHI", "DNI", "DHI", "Tamb", "RH"])
 
     if "Timestamp" in df.columns:
@@ -152,8 +161,20 @@ elif page == "Explore Country":
         )
         df = df[(df["Timestamp"] >= date_range[0]) & (df["Timestamp"] <= date_range[1])]
 
-    fig, ax = plt.subplots(figsize=(10,4))
-    ax.plot(df["Timestamp"], df[metric], color="darkorange", alpha=0.8)
+    # Resample long ranges to at most a few thousand points before plotting
+    series = df.set_index("Timestamp")[metric]
+    if len(series) > 2000:
+        span = series.index.max() - series.index.min()
+        if span < pd.Timedelta(days=30):
+            freq = pd.offsets.Hour()
+        elif span < pd.Timedelta(days=365):
+            freq = pd.offsets.Day()
+        else:
+            freq = pd.offsets.Week()
+        series = series.resample(freq).mean()
+
+    fig, ax = plt.subplots(figsize=(10,4), dpi=100)
+    ax.plot(series.index, series.values, color="darkorange", alpha=0.8)
     ax.set_title(f"{metric} over Time - {country}")
     ax.set_xlabel("Time")
     ax.set_ylabel(metric)
@@ -163,9 +184,9 @@ elif page == "Explore Country":
     st.dataframe(summary_statistics(df))
 
     st.subheader("Correlation Heatmap")
-    corr_cols = [c for c in ["GHI","DNI","DHI","Tamb","RH","WS"] if c in df.columns]
+    corr_cols = [c for c in explore_cols if c in df.columns]
     fig, ax = plt.subplots(figsize=(7,5))
-    sns.heatmap(df[corr_cols].corr(), annot=True, cmap="coolwarm", fmt=".2f")
+    sns.heatmap(correlation_matrix(df, corr_cols), annot=True, cmap="coolwarm", fmt=".2f")
     ax.set_title(f"Correlation Matrix - {country}")
     st.pyplot(fig)
 
@@ -179,29 +200,29 @@ elif page == "Analytics Lab":
     countries = ["Benin", "Sierra Leone", "Togo"]
     metric_x = st.selectbox("Select X-axis Metric:", ["GHI", "DNI", "DHI", "Tamb"])
     metric_y = st.selectbox("Select Y-axis Metric:", ["Tamb", "RH", "WS", "DHI"])
+    heatmap_cols = ["GHI", "DNI", "DHI", "Tamb", "RH", "WS", "BP"]
+    lab_cols = list(dict.fromkeys(heatmap_cols + [metric_x, metric_y]))
 
-    dfs = []
-    for c in countries:
-        df = get_country_df(c, key_prefix="analytics")
-        if not df.empty:
-            df["country"] = c
-            dfs.append(df)
+    uploaded_files = get_uploaded_files(countries, key_prefix="analytics")
+    from utils import load_all, correlation_matrix
+    df_all = load_all(countries, DATA_DIR, columns=lab_cols, uploaded_files=uploaded_files)
 
-    if len(dfs) == 0:
+    if df_all.empty:
         st.warning("No data available. Upload CSVs above.")
         st.stop()
 
-    df_all = pd.concat(dfs, ignore_index=True)
-
+    plt, sns = _lazy_plot()
     fig, ax = plt.subplots(figsize=(8,6))
-    sns.scatterplot(data=df_all, x=metric_x, y=metric_y, hue="country", alpha=0.7)
+    # a 20k-point subsample drawn as one raster layer looks the same and renders far faster
+    scatter_df = df_all.sample(min(len(df_all), 20_000), random_state=42)
+    sns.scatterplot(data=scatter_df, x=metric_x, y=metric_y, hue="country", alpha=0.7, rasterized=True)
     ax.set_title(f"{metric_x} vs {metric_y} by Country")
     st.pyplot(fig)
 
     st.subheader("Global Correlation Heatmap (All Countries Combined)")
-    corr_cols = [c for c in ["GHI","DNI","DHI","Tamb","RH","WS","BP"] if c in df_all.columns]
+    corr_cols = [c for c in heatmap_cols if c in df_all.columns]
     fig, ax = plt.subplots(figsize=(8,6))
-    sns.heatmap(df_all[corr_cols].corr(), annot=True, cmap="coolwarm", fmt=".2f")
+    sns.heatmap(correlation_matrix(df_all, corr_cols), annot=True, cmap="coolwarm", fmt=".2f")
     st.pyplot(fig)
 
     csv_data = df_all.sample(min(1000, len(df_all)), random_state=42).to_csv(index=False).encode("utf-8")
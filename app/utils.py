@@ -1,52 +1,267 @@
 # app/utils.py
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
+import streamlit as st
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 # -----------------------
 # Load country data
 # -----------------------
-def load_country_data(country: str, data_dir: str, uploaded_file=None):
+# Narrow dtypes for the cleaned columns: float32 keeps ~7 significant digits,
+# plenty for irradiance/weather readings, and halves memory traffic
+DTYPES = {
+    "GHI": "float32", "DNI": "float32", "DHI": "float32",
+    "ModA": "float32", "ModB": "float32",
+    "Tamb": "float32", "RH": "float32", "BP": "float32",
+    "WS": "float32", "WSgust": "float32", "WD": "float32",
+    "Cleaning": "int8"
+}
+
+def _downcast(df: pd.DataFrame):
+    """Narrow columns to DTYPES where that is safe; anything else is left as read."""
+    dtypes = {}
+    for c, t in DTYPES.items():
+        if c not in df.columns or df[c].dtype == t or not pd.api.types.is_numeric_dtype(df[c]):
+            continue  # absent, already narrow, or non-numeric tokens in the file
+        if t == "int8":
+            col = df[c]
+            if col.isna().any() or not ((col % 1 == 0) & col.between(-128, 127)).all():
+                continue  # int8 cannot hold NaN, fractions or out-of-range values
+        dtypes[c] = t
+    return df.astype(dtypes) if dtypes else df
+
+def _read_csv(source, columns=None):
+    # no dtype map at parse time: uploads and hand-made CSVs may hold NaN in
+    # Cleaning or stray text, which read_csv(dtype=...) would reject outright
+    usecols = None if columns is None else (lambda c: c in columns)
+    return _downcast(pd.read_csv(source, usecols=usecols))
+
+def _read_local(path: str, columns=None):
+    if path.endswith(".parquet"):
+        if columns is not None:
+            available = pq.read_schema(path).names
+            columns = [c for c in available if c in columns]
+        # files written before the narrow dtypes were introduced are float64
+        return _downcast(pd.read_parquet(path, columns=columns))
+    return _read_csv(path, columns)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _read_local_cached(path: str, columns=None, mtime=None):
     """
-    Load a country's CSV either from an uploaded file or from local data folder.
+    Read a local Parquet/CSV file once; later reruns are served from Streamlit's cache.
+
+    `mtime` is only part of the cache key, so a rewritten file is read again.
+    """
+    return _read_local(path, columns)
+
+def load_country_data(country: str, data_dir: str, uploaded_file=None, columns=None):
+    """
+    Load a country's data either from an uploaded CSV or from local data folder.
+
+    Locally, `<country>_clean.parquet` (typed, columnar) is preferred and the
+    cleaned CSV is the fallback, or is used instead when it is the newer file.
     
     Parameters:
     - country: Name of the country ("Benin", "Sierra Leone", "Togo")
     - data_dir: path to local data folder
     - uploaded_file: file object from Streamlit uploader (optional)
+    - columns: only read these columns; missing ones are skipped (optional)
     
     Returns:
     - pandas DataFrame
     """
+    if columns is not None:
+        columns = tuple(columns)  # hashable cache key
+
     if uploaded_file is not None:
-        return pd.read_csv(uploaded_file)
+        # uploaded files are not hashable, so this branch stays uncached
+        return _read_csv(uploaded_file, columns)
     
-    # fallback to local CSV
-    file_map = {
-        "Benin": "benin_clean.csv",
-        "Sierra Leone": "sierraleone_clean.csv",
-        "Togo": "togo_clean.csv"
-    }
-    path = os.path.join(data_dir, file_map[country])
-    if os.path.exists(path):
-        return pd.read_csv(path)
+    path = _clean_path(country, data_dir)
+    if path is not None:
+        return _read_local_cached(path, columns, os.path.getmtime(path))
     else:
         return pd.DataFrame()  # empty DF if file missing
 
+def _local_path(country: str, data_dir: str, kinds):
+    """First existing `<country>_<kind>` file in data_dir, or None."""
+    file_map = {
+        "Benin": "benin",
+        "Sierra Leone": "sierraleone",
+        "Togo": "togo"
+    }
+    for kind in kinds:
+        path = os.path.join(data_dir, f"{file_map[country]}_{kind}")
+        if os.path.exists(path):
+            return path
+    return None
+
+def _clean_path(country: str, data_dir: str):
+    """
+    Local cleaned data file for `country`, or None.
+
+    Prefers the Parquet (typed, columnar) unless the cleaned CSV is newer, e.g.
+    regenerated by a CSV-only cleaning run, in which case the Parquet is stale.
+    """
+    parquet_path = _local_path(country, data_dir, ("clean.parquet",))
+    csv_path = _local_path(country, data_dir, ("clean.csv",))
+    if parquet_path is not None and csv_path is not None:
+        if os.path.getmtime(csv_path) > os.path.getmtime(parquet_path):
+            return csv_path
+    return parquet_path or csv_path
+
+def _local_mtimes(countries, data_dir: str, rollups=True):
+    """(path, mtime) of the local files read for `countries`, for use in cache keys."""
+    mtimes = []
+    for c in countries:
+        paths = [_clean_path(c, data_dir)]
+        if rollups:
+            paths.append(_local_path(c, data_dir, ("daily.parquet",)))
+        mtimes.extend((p, os.path.getmtime(p)) for p in paths if p is not None)
+    return tuple(mtimes)
+
+# -----------------------
+# Load several countries
+# -----------------------
+def _load_all(countries: tuple, data_dir: str, columns=None, uploaded_files=None, cache_files=True):
+    uploaded_files = uploaded_files or {}
+    dfs = []
+    for i, c in enumerate(countries):
+        if cache_files:
+            df = load_country_data(c, data_dir, uploaded_file=uploaded_files.get(c), columns=columns)
+        else:
+            path = _clean_path(c, data_dir)
+            df = _read_local(path, columns) if path is not None else pd.DataFrame()
+        if not df.empty:
+            # dictionary-encoded from the start, so concat keeps one code per row
+            df["country"] = pd.Categorical.from_codes(np.full(len(df), i, dtype=np.int8), categories=countries)
+            dfs.append(df)
+    if not dfs:
+        return pd.DataFrame()
+    df_all = pd.concat(dfs, ignore_index=True)
+    df_all["country"] = df_all["country"].cat.remove_unused_categories()
+    return df_all
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _load_all_local(countries: tuple, data_dir: str, columns=None, mtimes=()):
+    # `mtimes` only keys the cache, so regenerated data files are picked up.
+    # Files are read uncached here: the concat is the cached copy, and also
+    # caching each country's frame would hold every row twice.
+    return _load_all(countries, data_dir, columns, cache_files=False)
+
+def load_all(countries, data_dir: str, columns=None, uploaded_files=None):
+    """
+    Load several countries into one DataFrame with a categorical "country" column.
+    
+    Parameters:
+    - countries: country names, in display order
+    - data_dir: path to local data folder
+    - columns: only read these columns; missing ones are skipped (optional)
+    - uploaded_files: dict of {country_name: uploaded_file} (optional)
+    
+    Returns:
+    - pandas DataFrame (empty if no country has data)
+    """
+    countries = tuple(countries)
+    if columns is not None:
+        columns = tuple(columns)  # hashable cache key
+    uploaded_files = {c: f for c, f in (uploaded_files or {}).items() if f is not None}
+    if not uploaded_files:
+        mtimes = _local_mtimes(countries, data_dir, rollups=False)
+        return _load_all_local(countries, data_dir, columns, mtimes)
+    return _load_all(countries, data_dir, columns, uploaded_files)
+
 # -----------------------
 # Summary statistics
 # -----------------------
+@st.cache_data(show_spinner=False, max_entries=32)
 def summary_statistics(df: pd.DataFrame, cols=None):
     if cols is None:
         cols = ["GHI", "DNI", "DHI"]
     existing_cols = [c for c in cols if c in df.columns]
     if not existing_cols:
         return pd.DataFrame()
-    summary = df[existing_cols].agg(["mean", "median", "std"]).round(2)
+    # float64 so .round(2) yields clean values from the float32 columns
+    summary = df[existing_cols].astype("float64").agg(["mean", "median", "std"]).round(2)
     return summary
 
+# -----------------------
+# Correlation matrix
+# -----------------------
+def correlation_matrix(df: pd.DataFrame, cols):
+    """Pearson correlation of `cols` via one np.corrcoef call (rows with NaN dropped)."""
+    arr = df[cols].to_numpy(dtype=np.float64)
+    arr = arr[~np.isnan(arr).any(axis=1)]
+    corr = np.atleast_2d(np.corrcoef(arr, rowvar=False))
+    return pd.DataFrame(corr, index=cols, columns=cols)
+
 # -----------------------
 # Country metrics (average per country)
 # -----------------------
+def _chunked_means(source, columns, chunksize=1_000_000):
+    """Column means of a CSV, streamed so at most `chunksize` rows are held in memory."""
+    sums = counts = pd.Series(dtype="float64")
+    for chunk in pd.read_csv(source, usecols=lambda c: c in columns, chunksize=chunksize):
+        sums = sums.add(chunk.sum(), fill_value=0)
+        counts = counts.add(chunk.count(), fill_value=0)
+    return (sums / counts).reindex([c for c in columns if c in sums.index])
+
+def _rollup_means(path: str, columns):
+    """Overall means from a daily rollup: count-weighted mean of the daily means."""
+    available = pq.read_schema(path).names
+    cols = [c for c in columns if f"{c}_mean" in available and f"{c}_count" in available]
+    daily = pd.read_parquet(path, columns=[f"{c}_{stat}" for c in cols for stat in ("mean", "count")])
+    return pd.Series(
+        {c: (daily[f"{c}_mean"] * daily[f"{c}_count"]).sum() / daily[f"{c}_count"].sum() for c in cols},
+        dtype="float64"
+    )
+
+def _country_means(country: str, data_dir: str, uploaded_file=None,
+                   columns=("GHI", "DNI", "DHI")):
+    if uploaded_file is not None:
+        return _chunked_means(uploaded_file, columns)
+    path = _clean_path(country, data_dir)
+    if path is None:
+        return pd.Series(dtype="float64")
+    daily_path = _local_path(country, data_dir, ("daily.parquet",))
+    if daily_path is not None and os.path.getmtime(daily_path) >= os.path.getmtime(path):
+        # ~365 pre-aggregated rows instead of the minute-level data; a rollup older
+        # than the clean file is stale and would disagree with the other pages
+        return _rollup_means(daily_path, columns)
+    if path.endswith(".parquet"):
+        # Parquet already reads only the requested columns. Uncached on purpose:
+        # this runs in worker threads, which have no Streamlit script context.
+        return _read_local(path, columns).astype("float64").mean()
+    return _chunked_means(path, columns)
+
+@st.cache_data(show_spinner=False)
+def _local_country_metrics(data_dir: str, mtimes=()):
+    # `mtimes` only keys the cache, so regenerated data files are picked up
+    return _country_metrics(data_dir, {})
+
+def _country_metrics(data_dir: str, uploaded_files: dict):
+    countries = ["Benin", "Sierra Leone", "Togo"]
+    results = []
+
+    # the C parser and Arrow reader release the GIL, so files load in parallel
+    with ThreadPoolExecutor(max_workers=len(countries)) as ex:
+        all_means = list(ex.map(
+            lambda c: _country_means(c, data_dir, uploaded_file=uploaded_files.get(c)),
+            countries
+        ))
+
+    for c, summary in zip(countries, all_means):
+        if not summary.empty:
+            summary["country"] = c
+            results.append(summary)
+    
+    if results:
+        return pd.DataFrame(results)
+    else:
+        return pd.DataFrame(columns=["GHI", "DNI", "DHI", "country"])
+
 def get_country_metrics(data_dir: str, uploaded_files=None):
     """
     Get average GHI, DNI, DHI for each country.
@@ -58,21 +273,7 @@ def get_country_metrics(data_dir: str, uploaded_files=None):
     Returns:
     - pandas DataFrame
     """
-    countries = ["Benin", "Sierra Leone", "Togo"]
-    results = []
-    
-    if uploaded_files is None:
-        uploaded_files = {}
-
-    for c in countries:
-        uploaded_file = uploaded_files.get(c)
-        df = load_country_data(c, data_dir, uploaded_file=uploaded_file)
-        if not df.empty:
-            summary = df[["GHI", "DNI", "DHI"]].mean()
-            summary["country"] = c
-            results.append(summary)
-    
-    if results:
-        return pd.DataFrame(results)
-    else:
-        return pd.DataFrame(columns=["GHI", "DNI", "DHI", "country"])
+    uploaded_files = {c: f for c, f in (uploaded_files or {}).items() if f is not None}
+    if not uploaded_files:
+        return _local_country_metrics(data_dir, _local_mtimes(["Benin", "Sierra Leone", "Togo"], data_dir))
+    return _country_metrics(data_dir, uploaded_files)